@@ -4,6 +4,7 @@ Configuration module for the Liberty Card Reconciliation API.
 import os
 import json
 import base64
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 from pathlib import Path
@@ -33,6 +34,12 @@ class Settings(BaseSettings):
     sheet_bank_parallex: str = "BANK STMT PARALLEX"
     sheet_ai_summary: str = "AI Summary"
     
+    # Seconds to reuse loaded sheet data between runs (0 disables caching)
+    sheets_cache_ttl: int = int(os.getenv("SHEETS_CACHE_TTL", "0"))
+    
+    # Number of worksheets written concurrently after a reconciliation run
+    sheets_push_workers: int = int(os.getenv("SHEETS_PUSH_WORKERS", "6"))
+    
     # Google Scopes
     google_scopes: list = [
         "https://www.googleapis.com/auth/spreadsheets",
@@ -43,6 +50,9 @@ class Settings(BaseSettings):
     api_host: str = os.getenv("API_HOST", "0.0.0.0")
     api_port: int = int(os.getenv("API_PORT", "8000"))
     api_reload: bool = os.getenv("API_RELOAD", "true").lower() == "true"
+    # Each worker loads its own pandas stack; os.cpu_count() would see the
+    # host's CPUs, not the container's limit, so the default stays small
+    api_workers: int = int(os.getenv("API_WORKERS", "2"))
     
     # Merchant IDs
     merchant_id_interswitch_unity: str = "2LBP87654321988"
@@ -71,34 +81,44 @@ class Settings(BaseSettings):
         Raises:
             RuntimeError: If no valid credentials found
         """
-        # Try Base64 encoded credentials
-        if self.google_credentials_base64:
-            try:
-                credentials_json = base64.b64decode(self.google_credentials_base64).decode('utf-8')
-                return json.loads(credentials_json)
-            except Exception as e:
-                raise RuntimeError(f"Failed to decode GOOGLE_CREDENTIALS_BASE64: {e}")
-        
-        # Try JSON string credentials
-        if self.google_credentials_json:
-            try:
-                return json.loads(self.google_credentials_json)
-            except Exception as e:
-                raise RuntimeError(f"Failed to parse GOOGLE_CREDENTIALS_JSON: {e}")
-        
-        # Try file-based credentials (for local development)
-        if self.service_account_file and Path(self.service_account_file).exists():
-            try:
-                with open(self.service_account_file) as f:
-                    return json.load(f)
-            except Exception as e:
-                raise RuntimeError(f"Failed to load {self.service_account_file}: {e}")
-        
-        # No credentials found
-        raise RuntimeError(
-            "No Google credentials found. Set one of: "
-            "GOOGLE_CREDENTIALS_BASE64, GOOGLE_CREDENTIALS_JSON, or SERVICE_ACCOUNT_FILE"
-        )
+        return dict(_load_google_credentials(
+            self.google_credentials_base64,
+            self.google_credentials_json,
+            self.service_account_file
+        ))
+
+
+@lru_cache(maxsize=4)
+def _load_google_credentials(credentials_base64: str, credentials_json: str, service_account_file: str) -> dict:
+    """Decode and parse Google credentials once per distinct source."""
+    # Try Base64 encoded credentials
+    if credentials_base64:
+        try:
+            decoded = base64.b64decode(credentials_base64).decode('utf-8')
+            return json.loads(decoded)
+        except Exception as e:
+            raise RuntimeError(f"Failed to decode GOOGLE_CREDENTIALS_BASE64: {e}")
+    
+    # Try JSON string credentials
+    if credentials_json:
+        try:
+            return json.loads(credentials_json)
+        except Exception as e:
+            raise RuntimeError(f"Failed to parse GOOGLE_CREDENTIALS_JSON: {e}")
+    
+    # Try file-based credentials (for local development)
+    if service_account_file and Path(service_account_file).exists():
+        try:
+            with open(service_account_file) as f:
+                return json.load(f)
+        except Exception as e:
+            raise RuntimeError(f"Failed to load {service_account_file}: {e}")
+    
+    # No credentials found
+    raise RuntimeError(
+        "No Google credentials found. Set one of: "
+        "GOOGLE_CREDENTIALS_BASE64, GOOGLE_CREDENTIALS_JSON, or SERVICE_ACCOUNT_FILE"
+    )
 
 
 settings = Settings()
@@ -1,11 +1,16 @@
 """
 Main FastAPI application for Liberty Card Reconciliation.
 """
+import asyncio
+import logging
+import time
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from datetime import datetime, timedelta, date
-from typing import Optional
-import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
 
 from config import settings
 from models.schemas import (
@@ -14,15 +19,19 @@ from models.schemas import (
     MetricsResponse,
     HealthResponse
 )
-from services.google_sheets_service import GoogleSheetsService
-from services.reconciliation_service import ReconciliationService
-from services.ai_service import AIService
+
+if TYPE_CHECKING:
+    from services.ai_service import AIService
+    from services.google_sheets_service import GoogleSheetsService
+
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Liberty Card Reconciliation API",
     description="API for card transaction reconciliation and reporting",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -35,6 +44,78 @@ app.add_middleware(
 )
 
 
+# Services (and pandas/gspread/openai behind them) are imported on first use
+# so workers and reloads start without paying for them up front.
+@lru_cache(maxsize=1)
+def get_sheets_service() -> "GoogleSheetsService":
+    """Return the process-wide Google Sheets service (connected on first use)."""
+    from services.google_sheets_service import GoogleSheetsService
+    return GoogleSheetsService()
+
+
+# Seconds between background Google Sheets connectivity probes for /health
+HEALTH_PROBE_INTERVAL = 60
+
+# In-flight background probe, kept referenced so it is not garbage collected
+_health_probe: Optional[asyncio.Task] = None
+
+# (monotonic time, error) of the last failed attempt to connect the shared
+# Google Sheets service; None once connected or before the first attempt
+_sheets_connect_failure: Optional[tuple] = None
+
+
+def _check_sheets_connection():
+    """
+    Connect the shared Google Sheets service if needed, then probe it when due.
+    
+    Runs in a worker thread for /health. A failed connection is recorded
+    instead of raised, and is retried on a later call.
+    """
+    global _sheets_connect_failure
+    try:
+        sheets_service = get_sheets_service()
+    except Exception as e:
+        _sheets_connect_failure = (time.monotonic(), str(e))
+        return
+    _sheets_connect_failure = None
+    if sheets_service.is_probe_due(HEALTH_PROBE_INTERVAL):
+        sheets_service.probe()
+
+
+@lru_cache(maxsize=1)
+def get_ai_service() -> "AIService":
+    """Return the process-wide AI service."""
+    from services.ai_service import AIService
+    return AIService()
+
+
+async def push_output_datasets(sheets_service, datasets: dict):
+    """
+    Append the reconciliation output datasets to their Google Sheets.
+    
+    Failures are logged rather than raised, so they cannot stop other
+    background tasks of the same request.
+    """
+    try:
+        await asyncio.to_thread(sheets_service.push_datasets, datasets)
+    except Exception:
+        logger.exception("Failed to push output datasets to Google Sheets")
+
+
+async def write_ai_summary(sheets_service, metrics: dict, run_date: date):
+    """
+    Generate the AI summary for a run and append it to the AI summary sheet.
+    
+    Failures are logged rather than raised, so they cannot stop other
+    background tasks of the same request.
+    """
+    try:
+        ai_summary = await get_ai_service().generate_summary(metrics)
+        await asyncio.to_thread(sheets_service.write_summary_to_sheet, ai_summary, run_date)
+    except Exception:
+        logger.exception("Failed to write AI summary for %s", run_date)
+
+
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint."""
@@ -49,17 +130,34 @@ async def root():
 async def health_check():
     """
     Health check endpoint to verify service status and dependencies.
+    
+    Reports the last known Google Sheets connectivity. Connecting the shared
+    service and re-probing it (when that result is older than
+    HEALTH_PROBE_INTERVAL) happen in a background thread, so polling this
+    endpoint never waits on the Sheets API, even before the first
+    connection has succeeded.
     """
+    global _health_probe
+    
     google_sheets_connected = False
     google_sheets_error = None
     openai_configured = bool(settings.openai_api_key)
     
-    try:
-        # Test Google Sheets connection
-        sheets_service = GoogleSheetsService()
-        google_sheets_connected = True
-    except Exception as e:
-        google_sheets_error = str(e)
+    if get_sheets_service.cache_info().currsize:
+        # Already connected, so this returns the cached service without I/O
+        sheets_service = get_sheets_service()
+        google_sheets_error = sheets_service.last_error
+        google_sheets_connected = google_sheets_error is None
+        check_due = sheets_service.is_probe_due(HEALTH_PROBE_INTERVAL)
+    elif _sheets_connect_failure is not None:
+        failed_at, google_sheets_error = _sheets_connect_failure
+        check_due = time.monotonic() - failed_at > HEALTH_PROBE_INTERVAL
+    else:
+        # Not connected yet; the first attempt starts below or is in flight
+        check_due = True
+    
+    if check_due and (_health_probe is None or _health_probe.done()):
+        _health_probe = asyncio.create_task(asyncio.to_thread(_check_sheets_connection))
     
     # Create health status message
     if google_sheets_connected:
@@ -70,7 +168,7 @@ async def health_check():
         if google_sheets_error:
             message = f"Google Sheets not connected: {google_sheets_error}"
         else:
-            message = "Google Sheets connection failed"
+            message = "Google Sheets connection in progress"
     
     return HealthResponse(
         status=status,
@@ -95,14 +193,15 @@ async def run_reconciliation(
     3. Performs settlement reconciliation
     4. Analyzes bank statements
     5. Generates metrics
-    6. Creates AI summary
-    7. Saves results back to Google Sheets
+    6. Saves results back to Google Sheets (in background)
+    7. Creates AI summary and saves it to Google Sheets (in background)
     
     Args:
         request: ReconciliationRequest with optional run_date and days_offset
         
     Returns:
-        ReconciliationResponse with metrics and AI summary
+        ReconciliationResponse with metrics; ai_summary is left unset and
+        the summary is written to the AI summary sheet once generated
     """
     recon_service = None
     try:
@@ -115,49 +214,46 @@ async def run_reconciliation(
             if not (year.isdigit() and month.isdigit() and day.isdigit()):
                 raise ValueError("run_date must be numeric in YYYY-MM-DD format")
             normalized_run_date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-            run_date = datetime.strptime(normalized_run_date, "%Y-%m-%d").date()
+            run_date = date.fromisoformat(normalized_run_date)
         else:
             run_date = (datetime.today() - timedelta(days=request.days_offset)).date()
         
         # Step 1: Load data from Google Sheets
-        sheets_service = GoogleSheetsService()
+        sheets_service = get_sheets_service()
         sheets_data = sheets_service.load_all_sheets()
         
         # Step 2: Run reconciliation
+        from services.reconciliation_service import ReconciliationService
         recon_service = ReconciliationService(sheets_data, run_date)
         results = recon_service.run_full_reconciliation()
         
         # Step 3: Save metrics to file
         metrics_path = recon_service.save_metrics_to_file()
         
-        # Step 4: Generate AI summary
-        ai_service = AIService()
-        ai_summary = ai_service.generate_summary(results['metrics'])
+        # Step 4: Push datasets to Google Sheets (in background). Background
+        # tasks run one after another, so each task logs its own failure
+        # instead of raising and skipping the tasks after it.
+        background_tasks.add_task(
+            push_output_datasets,
+            sheets_service,
+            recon_service.get_output_datasets()
+        )
         
-        # Step 5: Write AI summary to Google Sheets (in background)
+        # Steps 5-6: Generate AI summary and write it to Google Sheets (in background)
         background_tasks.add_task(
-            sheets_service.write_summary_to_sheet,
-            ai_summary,
+            write_ai_summary,
+            sheets_service,
+            results['metrics'],
             run_date
         )
         
-        # Step 6: Push datasets to Google Sheets (in background)
-        output_datasets = recon_service.get_output_datasets()
-        
-        def push_datasets_to_sheets():
-            for sheet_name, df in output_datasets.items():
-                worksheet = sheets_service.get_or_create_worksheet(sheet_name)
-                sheets_service.append_df_to_sheet(worksheet, df)
-        
-        background_tasks.add_task(push_datasets_to_sheets)
-        
         # Prepare response
         return ReconciliationResponse(
             status="success",
             message="Reconciliation completed successfully",
             run_date=str(run_date),
             metrics=MetricsResponse(**results['metrics']),
-            ai_summary=ai_summary,
+            ai_summary=None,
             metrics_file_path=metrics_path,
             debug=recon_service.get_debug_info() if debug else None
         )
@@ -177,6 +273,40 @@ async def run_reconciliation(
         raise HTTPException(status_code=500, detail=detail)
 
 
+@app.get("/metrics/latest", response_model=MetricsResponse, tags=["Metrics"])
+async def get_latest_metrics():
+    """
+    Retrieve the most recent metrics.
+    
+    Returns:
+        MetricsResponse with the latest reconciliation metrics
+    """
+    try:
+        import os
+        
+        # Files are named metrics_YYYY-MM-DD.json, so the lexicographically
+        # greatest name is the latest run date -- no stat() per file needed.
+        try:
+            with os.scandir(settings.output_dir) as entries:
+                metrics_files = [
+                    entry.name for entry in entries
+                    if entry.name.startswith("metrics_") and entry.name.endswith(".json")
+                ]
+        except FileNotFoundError:
+            metrics_files = []
+        
+        if not metrics_files:
+            raise HTTPException(status_code=404, detail="No metrics found")
+        
+        latest_file = Path(settings.output_dir) / max(metrics_files)
+        return MetricsResponse.model_validate_json(latest_file.read_bytes())
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving latest metrics: {str(e)}")
+
+
 @app.get("/metrics/{run_date}", response_model=MetricsResponse, tags=["Metrics"])
 async def get_metrics(run_date: str):
     """
@@ -189,16 +319,17 @@ async def get_metrics(run_date: str):
         MetricsResponse with reconciliation metrics
     """
     try:
-        # Validate date format
+        # strptime accepts unpadded parts (2026-2-7) like run_reconciliation,
+        # but not the compact or week forms fromisoformat would
         run_date_obj = datetime.strptime(run_date, "%Y-%m-%d").date()
-        
-        # Load metrics from file
-        metrics_path = f"{settings.output_dir}/metrics_{run_date}.json"
-        
-        with open(metrics_path, 'r') as f:
-            metrics = json.load(f)
-        
-        return MetricsResponse(**metrics)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="run_date must be in YYYY-MM-DD format")
+    
+    try:
+        # Load metrics from file, named by the zero-padded date like save_metrics_to_file
+        metrics_path = f"{settings.output_dir}/metrics_{run_date_obj.isoformat()}.json"
+        # Validate straight from the file bytes (parsed by pydantic-core)
+        return MetricsResponse.model_validate_json(Path(metrics_path).read_bytes())
         
     except FileNotFoundError:
         raise HTTPException(
@@ -209,36 +340,6 @@ async def get_metrics(run_date: str):
         raise HTTPException(status_code=500, detail=f"Error retrieving metrics: {str(e)}")
 
 
-@app.get("/metrics/latest", response_model=MetricsResponse, tags=["Metrics"])
-async def get_latest_metrics():
-    """
-    Retrieve the most recent metrics.
-    
-    Returns:
-        MetricsResponse with the latest reconciliation metrics
-    """
-    try:
-        import os
-        import glob
-        
-        # Find all metrics files
-        metrics_files = glob.glob(f"{settings.output_dir}/metrics_*.json")
-        
-        if not metrics_files:
-            raise HTTPException(status_code=404, detail="No metrics found")
-        
-        # Get the most recent file
-        latest_file = max(metrics_files, key=os.path.getctime)
-        
-        with open(latest_file, 'r') as f:
-            metrics = json.load(f)
-        
-        return MetricsResponse(**metrics)
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving latest metrics: {str(e)}")
-
-
 @app.get("/config", tags=["Configuration"])
 async def get_config():
     """
@@ -273,5 +374,9 @@ if __name__ == "__main__":
         "main:app",
         host=settings.api_host,
         port=settings.api_port,
-        reload=settings.api_reload
+        reload=settings.api_reload,
+        loop="uvloop",
+        http="httptools",
+        # Multiple workers cannot be combined with auto-reload
+        workers=1 if settings.api_reload else settings.api_workers
     )
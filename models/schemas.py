@@ -35,7 +35,7 @@ class MetricsResponse(BaseModel):
     total_settlement_unsettled_claims: float
     total_bank_isw_unsettled_claims: float
     total_bank_isw_charge_back: float
-    channels: Dict[str, Any]
+    channels: Dict[str, Dict[str, float]]
 
 
 class ReconciliationResponse(BaseModel):
@@ -1,21 +1,34 @@
 """
 AI service for generating summaries using OpenAI.
 """
-import json
-from openai import OpenAI
+import orjson
+from functools import lru_cache
 from typing import Dict
 from config import settings
 
+# Static instructions sent ahead of the per-run metrics. Keeping them as a
+# fixed leading message lets the provider reuse its prompt-prefix cache.
+_SYSTEM_PROMPT = (
+    "You are a financial operations analyst.\n"
+    "Analyze the metrics below and summarize performance, risks, and concerns."
+)
+
+
+@lru_cache(maxsize=1)
+def _get_client():
+    """Return the process-wide OpenAI client so its HTTP connection pool is reused."""
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=settings.openai_api_key)
+
 
 class AIService:
     """Service for generating AI summaries."""
     
     def __init__(self):
         """Initialize AI service."""
-        self.client = OpenAI(api_key=settings.openai_api_key)
         self.model = settings.ai_model
     
-    def generate_summary(self, metrics: Dict) -> str:
+    async def generate_summary(self, metrics: Dict) -> str:
         """
         Generate AI summary from metrics.
         
@@ -28,22 +41,23 @@ class AIService:
         if not settings.openai_api_key:
             return "OpenAI API key not configured. AI summary skipped."
         
-        metrics_json = json.dumps(metrics, indent=2)
-        
-        prompt = f"""
-You are a financial operations analyst.
-Analyze the metrics below and summarize performance, risks, and concerns.
-
-Metrics:
-{metrics_json}
-"""
+        metrics_json = orjson.dumps(metrics, option=orjson.OPT_INDENT_2).decode()
         
         try:
-            response = self.client.chat.completions.create(
+            # Built only once a key is known to be set; openai rejects an empty one
+            stream = await _get_client().chat.completions.create(
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500
+                messages=[
+                    {"role": "system", "content": _SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Metrics:\n{metrics_json}"}
+                ],
+                max_tokens=500,
+                stream=True
             )
-            return response.choices[0].message.content
+            parts = []
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+            return "".join(parts)
         except Exception as e:
             return f"AI summary could not be generated: {str(e)}"
@@ -1,36 +1,91 @@
 """
 Google Sheets service for data loading and writing.
 """
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import pandas as pd
 import gspread
+from gspread.utils import fill_gaps, numericise_all
+from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
 from config import settings
 
 
+# infer_dtype() results for object columns holding date/time values
+_DATE_LIKE_KINDS = {"datetime", "date", "time", "timedelta", "period"}
+
+# infer_dtype() results that may hide date/time values among other types
+_MIXED_KINDS = {"mixed", "mixed-integer"}
+
+# Worksheet title -> gspread Worksheet handle on the shared workbook
+_WORKSHEET_CACHE: dict = {}
+
+# Sheet name -> (monotonic load time, DataFrame), used when SHEETS_CACHE_TTL > 0
+_SHEET_CACHE: dict = {}
+
+
+@lru_cache(maxsize=1)
+def _get_workbook():
+    """
+    Authorize once per process and return the shared credentials, client and workbook.
+
+    Failures are not cached, so a later call retries the connection.
+    """
+    # Get credentials from environment variables
+    credentials_dict = settings.get_google_credentials()
+    
+    # Create credentials object
+    creds = Credentials.from_service_account_info(
+        credentials_dict,
+        scopes=settings.google_scopes
+    )
+    
+    # Authorize and open workbook
+    gc = gspread.authorize(creds)
+    workbook = gc.open_by_key(settings.spreadsheet_id)
+    return creds, gc, workbook
+
+
 class GoogleSheetsService:
     """Service for interacting with Google Sheets."""
     
     def __init__(self):
         """Initialize Google Sheets connection from environment credentials."""
         try:
-            # Get credentials from environment variables
-            credentials_dict = settings.get_google_credentials()
-            
-            # Create credentials object
-            self.creds = Credentials.from_service_account_info(
-                credentials_dict,
-                scopes=settings.google_scopes
-            )
-            
-            # Authorize and open workbook
-            self.gc = gspread.authorize(self.creds)
-            self.workbook = self.gc.open_by_key(settings.spreadsheet_id)
+            self.creds, self.gc, self.workbook = _get_workbook()
+            self._refresh_credentials_if_expired()
+            # Titles of worksheets created by this service that have no rows yet
+            self._empty_worksheets = set()
+            # Result of the last connectivity check (opening the workbook counts as one)
+            self.last_checked = time.monotonic()
+            self.last_error = None
         except Exception as e:
             raise RuntimeError(
                 f"Failed to initialize Google Sheets connection: {e}. "
                 f"Ensure GOOGLE_CREDENTIALS_BASE64, GOOGLE_CREDENTIALS_JSON, or SERVICE_ACCOUNT_FILE is set."
             )
     
+    def is_probe_due(self, max_age: float) -> bool:
+        """Whether the last connectivity check is older than max_age seconds."""
+        return time.monotonic() - self.last_checked > max_age
+    
+    def probe(self):
+        """Make a minimal metadata request and record whether it succeeded."""
+        try:
+            self._refresh_credentials_if_expired()
+            self.workbook.fetch_sheet_metadata(params={"fields": "spreadsheetId"})
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+        self.last_checked = time.monotonic()
+    
+    def _refresh_credentials_if_expired(self):
+        """Refresh the shared access token if it has expired."""
+        if self.creds.expired:
+            self.creds.refresh(Request())
+    
     def load_sheet_as_df(self, sheet_name: str) -> pd.DataFrame:
         """Load a sheet as a pandas DataFrame."""
         try:
@@ -41,59 +96,197 @@ class GoogleSheetsService:
             raise Exception(f"Error loading sheet '{sheet_name}': {str(e)}")
     
     def load_all_sheets(self) -> dict:
-        """Load all required sheets."""
-        sheets = {
-            'card_df': self.load_sheet_as_df(settings.sheet_card_transaction),
-            'nibss_unity_settlement_df': self.load_sheet_as_df(settings.sheet_nibss_settlement),
-            'unity_settlement': self.load_sheet_as_df(settings.sheet_isw_settlement),
-            'parallex_nibss': self.load_sheet_as_df(settings.sheet_parallex_nibss),
-            'collection_account_unity': self.load_sheet_as_df(settings.sheet_bank_unity),
-            'collection_account_parallex': self.load_sheet_as_df(settings.sheet_bank_parallex),
+        """Load all required sheets in a single batched request."""
+        sheet_names = {
+            'card_df': settings.sheet_card_transaction,
+            'nibss_unity_settlement_df': settings.sheet_nibss_settlement,
+            'unity_settlement': settings.sheet_isw_settlement,
+            'parallex_nibss': settings.sheet_parallex_nibss,
+            'collection_account_unity': settings.sheet_bank_unity,
+            'collection_account_parallex': settings.sheet_bank_parallex,
         }
-        return sheets
+        
+        now = time.monotonic()
+        sheets = {}
+        to_fetch = []
+        for key, sheet_name in sheet_names.items():
+            cached = _SHEET_CACHE.get(sheet_name)
+            if cached is not None and now - cached[0] < settings.sheets_cache_ttl:
+                sheets[key] = cached[1]
+            else:
+                to_fetch.append(key)
+        
+        if to_fetch:
+            ranges = [self._sheet_range(sheet_names[key]) for key in to_fetch]
+            try:
+                response = self.workbook.values_batch_get(ranges)
+            except Exception as e:
+                raise Exception(f"Error loading sheets {ranges}: {str(e)}")
+            
+            for key, value_range in zip(to_fetch, response.get('valueRanges', [])):
+                try:
+                    df = self._values_to_df(value_range.get('values', []))
+                except Exception as e:
+                    raise Exception(f"Error loading sheet '{sheet_names[key]}': {str(e)}")
+                sheets[key] = df
+                if settings.sheets_cache_ttl > 0:
+                    _SHEET_CACHE[sheet_names[key]] = (now, df)
+        
+        return {key: sheets[key] for key in sheet_names}
+    
+    @staticmethod
+    def _sheet_range(sheet_name: str) -> str:
+        """A1 range covering a whole sheet, quoted for names with spaces."""
+        return "'{}'".format(sheet_name.replace("'", "''"))
+    
+    @staticmethod
+    def _values_to_df(values: list) -> pd.DataFrame:
+        """
+        Build a DataFrame from a raw 2D values list (header row first).
+        
+        Cells are numericised the same way gspread's get_all_records() does,
+        without building an intermediate dict per row, and a repeated header
+        name is rejected just as get_all_records() rejects it.
+        """
+        if not values:
+            return pd.DataFrame()
+        
+        rows = fill_gaps(values)
+        header, records = rows[0], rows[1:]
+        if len(set(header)) != len(header):
+            raise gspread.exceptions.GSpreadException("the header row in the worksheet is not unique")
+        records = [
+            numericise_all(row, empty2zero=False, default_blank="")
+            for row in records
+        ]
+        return pd.DataFrame(records, columns=header)
     
     def get_or_create_worksheet(self, sheet_name: str, rows: int = 1000, cols: int = 50):
-        """Get or create a worksheet."""
+        """Get or create a worksheet, reusing handles fetched earlier in this process."""
+        worksheet = _WORKSHEET_CACHE.get(sheet_name)
+        if worksheet is not None:
+            return worksheet
+        
         try:
-            return self.workbook.worksheet(sheet_name)
+            worksheet = self.workbook.worksheet(sheet_name)
         except gspread.exceptions.WorksheetNotFound:
-            return self.workbook.add_worksheet(
+            worksheet = self.workbook.add_worksheet(
                 title=sheet_name,
                 rows=rows,
                 cols=cols
             )
+            self._empty_worksheets.add(sheet_name)
+        
+        _WORKSHEET_CACHE[sheet_name] = worksheet
+        return worksheet
+    
+    def _forget_worksheet(self, worksheet):
+        """Drop a cached worksheet handle, e.g. after it was renamed or deleted."""
+        _WORKSHEET_CACHE.pop(worksheet.title, None)
     
     def append_df_to_sheet(self, worksheet, df: pd.DataFrame):
         """Append DataFrame to a worksheet."""
-        if df.empty:
+        if not len(df):
             print(f"⚠️ Skipping empty DataFrame for sheet: {worksheet.title}")
             return
         
-        # Normalize dates and NaNs
+        # Normalize dates and NaNs (in place; datasets are not reused after upload)
         df = self._normalize_df_for_gsheets(df)
         
-        values = df.values.tolist()
-        existing_rows = len(worksheet.get_all_values())
+        try:
+            values = self._df_to_rows(df, include_header=self._is_worksheet_empty(worksheet))
+            worksheet.append_rows(values, value_input_option="USER_ENTERED", table_range="A1")
+        except gspread.exceptions.APIError:
+            self._forget_worksheet(worksheet)
+            raise
+        self._empty_worksheets.discard(worksheet.title)
+    
+    def push_datasets(self, datasets: dict):
+        """
+        Append each DataFrame to the worksheet named by its key.
+        
+        Sheets are written concurrently since each write is dominated by
+        network round trips; any failure is re-raised once all writes finish.
+        """
+        def push(item):
+            sheet_name, df = item
+            worksheet = self.get_or_create_worksheet(sheet_name)
+            self.append_df_to_sheet(worksheet, df)
         
-        if existing_rows == 0:
-            data = [df.columns.tolist()] + values
-            worksheet.append_rows(data, value_input_option="USER_ENTERED")
-        else:
-            worksheet.append_rows(values, value_input_option="USER_ENTERED")
+        if not datasets:
+            return
+        
+        max_workers = max(1, min(settings.sheets_push_workers, len(datasets)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(push, datasets.items()))
+    
+    def _is_worksheet_empty(self, worksheet) -> bool:
+        """Check whether a worksheet has no data, without downloading it."""
+        if worksheet.title in self._empty_worksheets:
+            return True
+        # A single-cell read instead of get_all_values()
+        return not worksheet.get_values("A1")
     
-    def _normalize_df_for_gsheets(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Normalize DataFrame for Google Sheets."""
-        df = df.copy()
+    @staticmethod
+    def _df_to_rows(df: pd.DataFrame, include_header: bool = False) -> list:
+        """
+        Convert a DataFrame to a list of row lists for the Sheets API.
         
-        for col in df.columns:
-            if pd.api.types.is_datetime64_any_dtype(df[col]):
-                df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S")
-            elif df[col].apply(lambda x: isinstance(x, pd.Timestamp)).any():
-                df[col] = df[col].astype(str)
-            elif df[col].apply(lambda x: hasattr(x, "isoformat")).any():
-                df[col] = df[col].astype(str)
+        Each column is converted with its own dtype-aware tolist() and then
+        transposed, instead of boxing the whole frame into one object array.
+        The optional header row is placed in the same list up front rather
+        than concatenated afterwards, so the payload is allocated once.
+        """
+        rows = [df.columns.tolist()] if include_header else []
+        columns = [series.tolist() for _, series in df.items()]
+        rows.extend(map(list, zip(*columns)))
+        return rows
+    
+    def _normalize_df_for_gsheets(self, df: pd.DataFrame, inplace: bool = True) -> pd.DataFrame:
+        """
+        Normalize DataFrame for Google Sheets.
+        
+        By default the frame is normalized in place: only the columns that
+        need converting are replaced, so the whole frame is never duplicated.
+        The caller must not rely on the original values afterwards; pass
+        inplace=False to work on a copy instead.
+        """
+        if not inplace:
+            df = df.copy()
         
-        return df.fillna("")
+        for col, dtype in df.dtypes.items():
+            series = df[col]
+            changed = False
+            
+            if isinstance(dtype, pd.CategoricalDtype):
+                # Categoricals cannot take "" as a fill value; write plain values
+                series = series.astype(object)
+                dtype = series.dtype
+                changed = True
+            
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                series = series.dt.strftime("%Y-%m-%d %H:%M:%S")
+                changed = True
+            elif pd.api.types.is_timedelta64_dtype(dtype) or isinstance(dtype, pd.PeriodDtype):
+                series = series.astype(str)
+                changed = True
+            elif dtype == object:
+                # One C-level inference pass instead of per-cell Python checks
+                kind = pd.api.types.infer_dtype(series, skipna=True)
+                if kind in _DATE_LIKE_KINDS or (
+                    kind in _MIXED_KINDS and series.map(lambda x: hasattr(x, "isoformat")).any()
+                ):
+                    series = series.astype(str)
+                    changed = True
+            
+            if series.hasnans:
+                series = series.fillna("")
+                changed = True
+            
+            if changed:
+                df[col] = series
+        
+        return df
     
     def write_summary_to_sheet(self, summary_text: str, run_date):
         """Write AI summary to Google Sheets."""
@@ -104,4 +297,8 @@ class GoogleSheetsService:
         else:
             run_date_str = str(run_date)
         
-        worksheet.append_row([run_date_str, summary_text[:5000]])
+        try:
+            worksheet.append_row([run_date_str, summary_text[:5000]])
+        except gspread.exceptions.APIError:
+            self._forget_worksheet(worksheet)
+            raise
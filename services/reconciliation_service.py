@@ -3,9 +3,11 @@ Core reconciliation service containing all business logic.
 """
 import pandas as pd
 import numpy as np
-import json
-import os
-from datetime import datetime, timedelta, date
+import orjson
+import re
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
 from typing import Dict, Tuple
 import warnings
 
@@ -13,11 +15,82 @@ from config import settings
 
 warnings.filterwarnings('ignore')
 pd.set_option('display.max_columns', 50)
+# Copies made below are lazy: column data is only duplicated when written
+pd.set_option('mode.copy_on_write', True)
+
+# Bank narration flags set by ReconciliationService._classify_narration. They
+# are bits rather than exclusive labels because a narration can match several
+# rules (e.g. a 2LBP narration that also ends in TRANSACTION).
+_NARR_ISW = 1       # upper-cased starts with "2LBP"
+_NARR_BEING = 2     # stripped starts with "BEING"
+_NARR_RVSL = 4      # starts with "RVSL"
+_NARR_NEFT = 8      # stripped ends with "NEFT"
+_NARR_TOF = 16      # ends with "TRANSACTION"
+_NARR_DAILY = 32    # starts with "DAILY"
+
+# Splits an ISW narration into tid, stan, pan, rrn, date and narration. Fields
+# are dash-separated, except that the rrn (9+ digits) can be followed by the
+# "DD MM YYYY-" date with only whitespace in between.
+_ISW_NARRATION_SPLIT = re.compile(r'\s*-\s*|(?<=\d{9})\s+(?=\d{2}\s+\d{2}\s+\d{4}-)')
+
+
+@lru_cache(maxsize=None)
+def _output_dir(path: str) -> Path:
+    """Return the output directory, creating it only on first use per process."""
+    output_dir = Path(path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return output_dir
 
 
 class ReconciliationService:
     """Service for performing card transaction reconciliation."""
     
+    # Columns reported for card-side unsettled claims
+    CLAIM_COLUMNS = [
+        'date_created', 'reference_number', 'stan', 'amount', 'merchant_id', 'terminal_id', 'pan_number'
+    ]
+    # Columns reported for settlement-side charge backs
+    CHARGE_BACK_COLUMNS = [
+        'Local_Date_Time', 'Terminal_ID', 'Merchant_ID', 'STAN', 'PAN', 'Tran_Amount_Req', 'Retrieval_Reference_Nr'
+    ]
+    # Columns reported for bank-statement charge backs
+    BANK_CHARGE_BACK_COLUMNS = [
+        'Date', 'Transaction Narration', 'Reference', 'Value Date', 'Debit', 'Credit', 'Balance', 'rrn', 't_date'
+    ]
+    
+    # Metrics channels: name -> (summary, settlement, charge back, unsettled
+    # claim) result keys
+    METRIC_CHANNELS = {
+        "NIBSS": ('nibss_unity_df', 'nibss_unity_settlement', 'charge_back', 'unsettled_claim'),
+        "INTERSWITCH": ('interswitch_unity_df', 'unity_isw_agg', 'isw_charge_back', 'isw_unsettled_claim'),
+        "PARALLEX": ('nibss_parallex_df', 'parallex_nibss_df', 'parallex_charge_back', 'parallex_unsettled_claim')
+    }
+    # Every (result key, column) sum the metrics need, in reduction order: a
+    # charge back / unsettled claim pair per channel, then the ISW bank pair
+    METRIC_SUMS = tuple(
+        pair
+        for _, _, charge_back, unsettled_claim in METRIC_CHANNELS.values()
+        for pair in ((charge_back, 'Tran_Amount_Req'), (unsettled_claim, 'amount'))
+    ) + (('isw_b_unsettled_claim', 'amount'), ('isw_b_charge_back', 'Credit'))
+    
+    # Output datasets: name -> (layout, result keys). "side_by_side" joins
+    # one-row summaries column-wise; "stacked" puts unsettled claims and
+    # charge backs (disjoint columns) on their own rows of one sheet.
+    OUTPUT_DATASETS = {
+        "paybox_trans_df": ("side_by_side", ("paybox_trans_df",)),
+        "nibss_parallex": ("side_by_side", ("nibss_parallex_df", "parallex_nibss_df")),
+        "nibss_unity": ("side_by_side", ("nibss_unity_df", "nibss_unity_settlement")),
+        "nibss_reconciliation": ("stacked", ("unsettled_claim", "charge_back")),
+        "isw_reconciliation": ("stacked", ("isw_unsettled_claim", "isw_charge_back")),
+        "parallex_reconciliation": ("stacked", ("parallex_unsettled_claim", "parallex_charge_back")),
+        "isw_bank_reconciliation": ("stacked", ("isw_b_unsettled_claim", "isw_b_charge_back")),
+        "nerf_nibss_b_credit": ("side_by_side", ("nerf_nibss_b_credit",)),
+        "being_nibss_summary": ("side_by_side", ("being_nibss_summary",)),
+        "cb": ("side_by_side", ("cb",)),
+        "tof_df": ("side_by_side", ("tof_df",)),
+        "ds": ("side_by_side", ("ds",))
+    }
+    
     def __init__(self, sheets_data: dict, run_date: date):
         """
         Initialize the reconciliation service.
@@ -36,15 +109,17 @@ class ReconciliationService:
         self.raw_collection_account_unity = sheets_data['collection_account_unity']
         self.raw_collection_account_parallex = sheets_data['collection_account_parallex']
 
-        self.card_df = sheets_data['card_df'].copy()
-        self.nibss_unity_settlement_df = sheets_data['nibss_unity_settlement_df'].copy()
-        self.unity_settlement = sheets_data['unity_settlement'].copy()
-        self.parallex_nibss = sheets_data['parallex_nibss'].copy()
-        self.collection_account_unity = sheets_data['collection_account_unity'].copy()
-        self.collection_account_parallex = sheets_data['collection_account_parallex'].copy()
+        self.card_df = sheets_data['card_df'].copy(deep=False)
+        self.nibss_unity_settlement_df = sheets_data['nibss_unity_settlement_df'].copy(deep=False)
+        self.unity_settlement = sheets_data['unity_settlement'].copy(deep=False)
+        self.parallex_nibss = sheets_data['parallex_nibss'].copy(deep=False)
+        self.collection_account_unity = sheets_data['collection_account_unity'].copy(deep=False)
+        self.collection_account_parallex = sheets_data['collection_account_parallex'].copy(deep=False)
         
         # Results storage
         self.results = {}
+        # Full-history date columns parsed in _prepare_data, reused for debug
+        self._parsed_dates = {}
         self.metrics = {}
     
     def run_full_reconciliation(self) -> Dict:
@@ -80,33 +155,81 @@ class ReconciliationService:
     def _normalize_merchant_id_series(self, series: pd.Series) -> pd.Series:
         """Normalize merchant ID series to string without trailing .0."""
         safe_series = self._safe_str_series(series)
-        return safe_series.str.strip().str.replace(r"\.0$", "", regex=True)
+        return safe_series.str.strip().str.removesuffix(".0")
 
     def _safe_str_series(self, series: pd.Series) -> pd.Series:
         """Return a string-typed series safe for .str operations."""
         safe = series.where(series.notna(), "")
         return safe.astype(str)
 
+    def _classify_narration(self, series: pd.Series) -> np.ndarray:
+        """
+        Classify bank narrations into an int8 array of _NARR_* bit flags.
+        
+        Every string predicate the bank statement filters need is evaluated
+        once here; the filters then test bits instead of rescanning the text.
+        """
+        text = self._safe_str_series(series)
+        stripped = text.str.strip()
+        rules = (
+            (_NARR_ISW, text.str.upper().str.startswith('2LBP')),
+            (_NARR_BEING, stripped.str.startswith('BEING')),
+            (_NARR_RVSL, text.str.startswith('RVSL')),
+            (_NARR_NEFT, stripped.str.endswith('NEFT')),
+            (_NARR_TOF, text.str.endswith('TRANSACTION')),
+            (_NARR_DAILY, text.str.startswith('DAILY')),
+        )
+        flags = np.zeros(len(text), dtype=np.int8)
+        for bit, mask in rules:
+            flags[mask.to_numpy(dtype=bool)] |= bit
+        return flags
+
+    def _factorize_keys(self, *keys: pd.Series) -> list:
+        """
+        Encode join key series into one shared integer code space.
+        
+        Equal keys get the same code across every series (missing keys all
+        get -1, matching merge/isin treating NaN as equal), so reconciliations
+        can compare integer codes instead of re-hashing each key column.
+        """
+        codes, _ = pd.factorize(pd.concat(keys, ignore_index=True))
+        return np.split(codes, np.cumsum([len(key) for key in keys[:-1]]))
+
+    def _day_mask(self, series: pd.Series, day) -> pd.Series:
+        """
+        Vectorized equivalent of `series.dt.date == day` for a datetime series.
+        
+        Compares against the half-open range [day, day + 1 day) on the
+        datetime64 values directly instead of materializing datetime.date
+        objects for every row.
+        """
+        start = pd.Timestamp(day)
+        return (series >= start) & (series < start + pd.Timedelta(days=1))
+    
     def _coerce_numeric_columns(self, df: pd.DataFrame, columns: list) -> None:
         """Coerce known numeric columns to numeric types."""
-        for col in columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors="coerce")
+        present = [col for col in columns if col in df.columns]
+        if present:
+            df[present] = df[present].apply(pd.to_numeric, errors="coerce")
     
     def _prepare_data(self):
         """Prepare and convert date columns."""
-        # Convert date columns
-        self.card_df['date_created'] = pd.to_datetime(
-            self.card_df['date_created'], errors='coerce'
-        ).dt.date
-        self.nibss_unity_settlement_df['Local_Date_Time'] = pd.to_datetime(
-            self.nibss_unity_settlement_df['Local_Date_Time'], errors='coerce'
+        # Convert date columns and filter by run date first, so the
+        # normalization below only touches rows that are kept
+        date_created = pd.to_datetime(self.card_df['date_created'], errors='coerce')
+        self._parsed_dates['card_df'] = date_created
+        on_run_date = self._day_mask(date_created, self.run_date)
+        self.card_df = self.card_df[on_run_date]
+        self.card_df['date_created'] = date_created[on_run_date].dt.date
+        
+        self.nibss_unity_settlement_df = self._filter_run_date(
+            'nibss_unity_settlement_df', self.nibss_unity_settlement_df, 'Local_Date_Time'
         )
-        self.unity_settlement['Local_Date_Time'] = pd.to_datetime(
-            self.unity_settlement['Local_Date_Time'], errors='coerce'
+        self.unity_settlement = self._filter_run_date(
+            'unity_settlement', self.unity_settlement, 'Local_Date_Time'
         )
-        self.parallex_nibss['Local_Date_Time'] = pd.to_datetime(
-            self.parallex_nibss['Local_Date_Time'], errors='coerce'
+        self.parallex_nibss = self._filter_run_date(
+            'parallex_nibss', self.parallex_nibss, 'Local_Date_Time'
         )
 
         # Normalize identifiers and numeric fields
@@ -120,9 +243,10 @@ class ReconciliationService:
             settings.merchant_id_nibss_parallex
         )
 
+        # Few distinct merchant IDs: the channel filters compare category codes
         self.card_df['merchant_id'] = self._normalize_merchant_id_series(
             self.card_df['merchant_id']
-        )
+        ).astype('category')
         self.nibss_unity_settlement_df['Merchant_ID'] = self._normalize_merchant_id_series(
             self.nibss_unity_settlement_df['Merchant_ID']
         )
@@ -133,13 +257,8 @@ class ReconciliationService:
             self.parallex_nibss['Merchant_ID']
         )
 
-        if 'host_resp_code' in self.card_df.columns:
-            self.card_df['host_resp_code'] = pd.to_numeric(
-                self.card_df['host_resp_code'], errors='coerce'
-            )
-
         self._coerce_numeric_columns(self.card_df, [
-            'amount', 'liberty_commission', 'final_liberty_rev',
+            'host_resp_code', 'amount', 'liberty_commission', 'final_liberty_rev',
             'ro_profit', 'liberty_profit'
         ])
         self._coerce_numeric_columns(self.nibss_unity_settlement_df, [
@@ -158,9 +277,15 @@ class ReconciliationService:
             self.collection_account_parallex['Transaction Narration'] = self._safe_str_series(
                 self.collection_account_parallex['Transaction Narration']
             )
-        
-        # Filter by run date
-        self.card_df = self.card_df[self.card_df['date_created'] == self.run_date]
+    
+    def _filter_run_date(self, name: str, df: pd.DataFrame, column: str) -> pd.DataFrame:
+        """Parse a datetime column and keep only the rows on the run date."""
+        parsed = pd.to_datetime(df[column], errors='coerce')
+        self._parsed_dates[name] = parsed
+        on_run_date = self._day_mask(parsed, self.run_date)
+        df = df[on_run_date]
+        df[column] = parsed[on_run_date]
+        return df
     
     def _process_card_transactions(self):
         """Process card transactions and separate by type."""
@@ -170,14 +295,14 @@ class ReconciliationService:
         
         # PAYBOX transactions
         paybox_trans = cashout_trans[cashout_trans['type_of_user'] == 'MERCHANT']
-        self.results['paybox_trans_df'] = paybox_trans.agg({
+        self.results['paybox_trans_df'] = self._scalar_summary(paybox_trans, {
             'amount': 'sum',
             'id': 'count',
             'liberty_commission': 'sum',
             'final_liberty_rev': 'sum',
             'ro_profit': 'sum',
             'liberty_profit': 'sum'
-        }).to_frame().T.round(2)
+        }).round(2)
         
         # Separate by merchant ID
         self.interswitch_unity = cashout_trans[
@@ -190,226 +315,216 @@ class ReconciliationService:
             cashout_trans['merchant_id'] == self.merchant_id_nibss_parallex
         ]
         
-        # Process Interswitch Unity
-        self.interswitch_unity = self.interswitch_unity.copy()
-        self.interswitch_unity['fee'] = self.interswitch_unity['liberty_commission']
-        self.interswitch_unity['cost_of_acquisition'] = 17
-        self.interswitch_unity['agent_commission'] = 3
-        self.interswitch_unity['Gross'] = (
-            self.interswitch_unity['fee'] 
-            - self.interswitch_unity['cost_of_acquisition'] 
-            - self.interswitch_unity['agent_commission']
-        ).round(2)
-        
-        # Process NIBSS Unity
-        self.nibss_unity = self.nibss_unity.copy()
-        self.nibss_unity['fee'] = self.nibss_unity['liberty_commission']
-        self.nibss_unity['cost_of_acquisition'] = self.nibss_unity['amount'] * 0.0022
-        self.nibss_unity['agent_commission'] = self.nibss_unity['ro_profit']
-        self.nibss_unity['Gross'] = (
-            self.nibss_unity['fee'] 
-            - self.nibss_unity['cost_of_acquisition'] 
-            - self.nibss_unity['agent_commission']
-        ).round(2)
-        
-        # Process NIBSS Parallex
-        self.nibss_parallex = self.nibss_parallex.copy()
-        self.nibss_parallex['fee'] = self.nibss_parallex['liberty_commission']
-        self.nibss_parallex['cost_of_acquisition'] = self.nibss_parallex['amount'] * 0.0022
-        self.nibss_parallex['agent_commission'] = self.nibss_parallex['ro_profit']
-        self.nibss_parallex['Gross'] = (
-            self.nibss_parallex['fee'] 
-            - self.nibss_parallex['cost_of_acquisition'] 
-            - self.nibss_parallex['agent_commission']
-        ).round(2)
+        # Price each channel
+        self.interswitch_unity = self._price_channel(
+            self.interswitch_unity, cost_of_acquisition=17, agent_commission=3
+        )
+        self.nibss_unity = self._price_channel(
+            self.nibss_unity,
+            cost_of_acquisition=self.nibss_unity['amount'] * 0.0022,
+            agent_commission=self.nibss_unity['ro_profit']
+        )
+        self.nibss_parallex = self._price_channel(
+            self.nibss_parallex,
+            cost_of_acquisition=self.nibss_parallex['amount'] * 0.0022,
+            agent_commission=self.nibss_parallex['ro_profit']
+        )
         
         # Aggregate results
-        self.results['interswitch_unity_df'] = self.interswitch_unity.agg({
+        self.results['interswitch_unity_df'] = self._scalar_summary(self.interswitch_unity, {
             'amount': 'sum',
             'id': 'count',
             'fee': 'sum',
             'cost_of_acquisition': 'sum',
             'agent_commission': 'sum',
             'Gross': 'sum'
-        }).to_frame().T.round(2)
+        }).round(2)
         
-        self.results['nibss_unity_df'] = self.nibss_unity.agg({
+        self.results['nibss_unity_df'] = self._scalar_summary(self.nibss_unity, {
             'amount': 'sum',
             'id': 'count',
             'fee': 'sum',
             'cost_of_acquisition': 'sum',
             'agent_commission': 'sum',
             'Gross': 'sum'
-        }).to_frame().T.round(2)
+        }).round(2)
         
-        self.results['nibss_parallex_df'] = self.nibss_parallex.agg({
+        self.results['nibss_parallex_df'] = self._scalar_summary(self.nibss_parallex, {
             'amount': 'sum',
             'id': 'count',
             'fee': 'sum',
             'cost_of_acquisition': 'sum',
             'agent_commission': 'sum',
             'Gross': 'sum'
-        }).to_frame().T.round(2)
+        }).round(2)
+    
+    def _scalar_summary(self, df: pd.DataFrame, spec: Dict[str, str]) -> pd.DataFrame:
+        """
+        One-row summary of df, equivalent to df.agg(spec).to_frame().T.
+        
+        spec maps each column, in output order, to 'sum' (NaN-skipping) or
+        'count' (non-null values); sums are reduced straight from the
+        column's numpy values without going through pandas' agg dispatch.
+        """
+        row = {}
+        for column, how in spec.items():
+            values = df[column]
+            row[column] = values.count() if how == 'count' else np.nansum(values.to_numpy())
+        return pd.DataFrame([row])
+    
+    def _price_channel(self, df: pd.DataFrame, cost_of_acquisition, agent_commission) -> pd.DataFrame:
+        """
+        Return a channel's transactions with fee, cost, commission and Gross.
+        
+        cost_of_acquisition and agent_commission may be scalars or Series
+        aligned with df; all four columns are added in a single assign.
+        """
+        fee = df['liberty_commission']
+        return df.assign(
+            fee=fee,
+            cost_of_acquisition=cost_of_acquisition,
+            agent_commission=agent_commission,
+            Gross=np.round(fee - cost_of_acquisition - agent_commission, 2)
+        )
     
     def _process_settlements(self):
         """Process settlement reports."""
+        # Settlement frames were already filtered to the run date in _prepare_data
         # Unity NIBSS Settlement
         nibss_unity_sett = self.nibss_unity_settlement_df[
-            self.nibss_unity_settlement_df['Local_Date_Time'].dt.date == self.run_date
-        ]
-        nibss_unity_sett = nibss_unity_sett[
-            nibss_unity_sett['Merchant_ID'] == self.merchant_id_nibss_unity
-        ]
-        nibss_unity_sett = nibss_unity_sett.drop_duplicates()
+            self.nibss_unity_settlement_df['Merchant_ID'] == self.merchant_id_nibss_unity
+        ].drop_duplicates()
         
-        self.results['nibss_unity_settlement'] = nibss_unity_sett.agg({
+        self.results['nibss_unity_settlement'] = self._scalar_summary(nibss_unity_sett, {
             'Tran_Amount_Req': 'sum',
             'Merchant_ID': 'count',
             'Merchant_Receivable': 'sum',
             'Merchant_Discount': 'sum'
-        }).to_frame().T.round(2)
-        
-        # NIBSS Unity Reconciliation
-        recon_df = self.nibss_unity.merge(
-            nibss_unity_sett,
-            how='outer',
-            left_on='reference_number',
-            right_on='Retrieval_Reference_Nr',
-            indicator=True
-        )
-        
-        self.results['unsettled_claim'] = recon_df[recon_df['_merge'] == 'left_only'][[
-            'date_created', 'reference_number', 'stan', 'amount', 'merchant_id', 'terminal_id', 'pan_number'
-        ]]
-        
-        self.results['charge_back'] = recon_df[recon_df['_merge'] == 'right_only'][[
-            'Local_Date_Time', 'Terminal_ID', 'Merchant_ID', 'STAN', 'PAN', 'Tran_Amount_Req', 'Retrieval_Reference_Nr'
-        ]]
+        }).round(2)
         
         # Unity Interswitch Settlement
-        unity_isw = self.unity_settlement[
-            self.unity_settlement['Local_Date_Time'].dt.date == self.run_date
-        ].drop_duplicates()
+        unity_isw = self.unity_settlement.drop_duplicates()
         
-        self.results['unity_isw_agg'] = unity_isw.agg({
+        self.results['unity_isw_agg'] = self._scalar_summary(unity_isw, {
             'Tran_Amount_Req': 'sum',
             'Merchant_ID': 'count'
-        }).to_frame().T
-        
-        # ISW Reconciliation
-        self.isw_recon = self.interswitch_unity.merge(
-            unity_isw,
-            how='inner',
-            left_on='reference_number',
-            right_on='Retrieval_Reference_Nr'
-        )
-        
-        isw_recon_df = self.interswitch_unity.merge(
-            unity_isw,
-            how='outer',
-            left_on='reference_number',
-            right_on='Retrieval_Reference_Nr',
-            indicator=True
-        )
-        
-        self.results['isw_unsettled_claim'] = isw_recon_df[isw_recon_df['_merge'] == 'left_only'][[
-            'date_created', 'reference_number', 'stan', 'amount', 'merchant_id', 'terminal_id', 'pan_number'
-        ]]
-        
-        self.results['isw_charge_back'] = isw_recon_df[isw_recon_df['_merge'] == 'right_only'][[
-            'Local_Date_Time', 'Terminal_ID', 'Merchant_ID', 'STAN', 'PAN', 'Tran_Amount_Req', 'Retrieval_Reference_Nr'
-        ]]
+        })
         
         # Parallex NIBSS Settlement
         parallex_df = self.parallex_nibss[
-            self.parallex_nibss['Local_Date_Time'].dt.date == self.run_date
-        ]
-        parallex_df = parallex_df[
-            parallex_df['Merchant_ID'] == self.merchant_id_nibss_parallex
+            self.parallex_nibss['Merchant_ID'] == self.merchant_id_nibss_parallex
         ].drop_duplicates()
         
-        self.results['parallex_nibss_df'] = parallex_df.agg({
+        self.results['parallex_nibss_df'] = self._scalar_summary(parallex_df, {
             'Tran_Amount_Req': 'sum',
             'Merchant_ID': 'count',
             'Merchant_Receivable': 'sum',
             'Merchant_Discount': 'sum'
-        }).to_frame().T.round(2)
+        }).round(2)
+        
+        # Hash every reference key once; the reconciliations compare codes
+        (
+            nibss_unity_ref, nibss_unity_rrn,
+            isw_ref, isw_rrn,
+            parallex_ref, parallex_rrn
+        ) = self._factorize_keys(
+            self.nibss_unity['reference_number'], nibss_unity_sett['Retrieval_Reference_Nr'],
+            self.interswitch_unity['reference_number'], unity_isw['Retrieval_Reference_Nr'],
+            self.nibss_parallex['reference_number'], parallex_df['Retrieval_Reference_Nr']
+        )
         
-        # Parallex Reconciliation
-        parallex_recon_df = self.nibss_parallex.merge(
-            parallex_df,
-            how='outer',
-            left_on='reference_number',
-            right_on='Retrieval_Reference_Nr',
-            indicator=True
+        # NIBSS Unity Reconciliation
+        self.results['unsettled_claim'], self.results['charge_back'] = self._reconcile_channel(
+            self.nibss_unity, nibss_unity_ref, nibss_unity_sett, nibss_unity_rrn
         )
         
-        self.results['parallex_unsettled_claim'] = parallex_recon_df[
-            parallex_recon_df['_merge'] == 'left_only'
-        ][['date_created', 'reference_number', 'stan', 'amount', 'merchant_id', 'terminal_id', 'pan_number']]
+        # ISW Reconciliation
+        self.results['isw_unsettled_claim'], self.results['isw_charge_back'] = self._reconcile_channel(
+            self.interswitch_unity, isw_ref, unity_isw, isw_rrn
+        )
         
-        self.results['parallex_charge_back'] = parallex_recon_df[
-            parallex_recon_df['_merge'] == 'right_only'
-        ][['Local_Date_Time', 'Terminal_ID', 'Merchant_ID', 'STAN', 'PAN', 'Tran_Amount_Req', 'Retrieval_Reference_Nr']]
+        # Matched ISW claims for the bank step; only the claim columns are used
+        # downstream, so the join carries just those and the settlement codes
+        self.isw_recon = self.interswitch_unity[self.CLAIM_COLUMNS].assign(_ref_code=isw_ref).merge(
+            pd.DataFrame({'_ref_code': isw_rrn}),
+            how='inner',
+            on='_ref_code'
+        ).drop(columns='_ref_code')
+        
+        # Parallex Reconciliation
+        self.results['parallex_unsettled_claim'], self.results['parallex_charge_back'] = self._reconcile_channel(
+            self.nibss_parallex, parallex_ref, parallex_df, parallex_rrn
+        )
         
         # Store unity_isw for later use
         self.unity_isw = unity_isw
     
+    def _reconcile_channel(
+        self,
+        claims: pd.DataFrame,
+        claim_codes: np.ndarray,
+        settlement: pd.DataFrame,
+        settlement_codes: np.ndarray
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Split one channel into unsettled claims and charge backs.
+        
+        Args:
+            claims: Card transactions for the channel
+            claim_codes: Factorized reference_number codes of claims
+            settlement: Settlement report rows for the channel
+            settlement_codes: Factorized Retrieval_Reference_Nr codes of settlement
+            
+        Returns:
+            Claims missing from the settlement, and settlement rows with no claim
+        """
+        unsettled_claim = claims[~np.isin(claim_codes, settlement_codes)][self.CLAIM_COLUMNS]
+        charge_back = settlement[~np.isin(settlement_codes, claim_codes)][self.CHARGE_BACK_COLUMNS]
+        return unsettled_claim, charge_back
+    
     def _process_bank_statements(self):
         """Process bank statements."""
         # Unity Interswitch Account
-        narration_series = self._safe_str_series(
+        flags = self._classify_narration(
             self.collection_account_unity['Transaction Narration']
         )
-        isw_collection = self.collection_account_unity[
-            narration_series.str.upper().str.startswith('2LBP')
-        ]
+        # Decode each rule once; every bank filter below reuses these masks
+        self._unity_masks = {
+            name: (flags & bit) != 0
+            for name, bit in (
+                ('isw', _NARR_ISW), ('being', _NARR_BEING), ('rvsl', _NARR_RVSL),
+                ('neft', _NARR_NEFT), ('tof', _NARR_TOF), ('daily', _NARR_DAILY)
+            )
+        }
+        isw_collection = self.collection_account_unity[self._unity_masks['isw']]
         
-        # Fix narration
+        # Split narration
         isw_narration = self._safe_str_series(isw_collection['Transaction Narration'])
-        fixed_narration = isw_narration.str.replace(
-            r'(\d{9,12})\s+(\d{2}\s+\d{2}\s+\d{4}-)',
-            r'\1 - \2',
-            regex=True
-        )
-        
         isw_collection[['tid', 'stans', 'pan', 'rrn', 't_date', 'narration']] = (
-            fixed_narration.str.split(r'\s*-\s*', expand=True)
+            isw_narration.str.split(_ISW_NARRATION_SPLIT, expand=True)
         )
-        isw_collection['rrn'] = isw_collection['rrn'].astype('int')
+        # Parsed in one vectorized pass rather than int() per element; the
+        # int64 cast raises on a missing rrn instead of leaving NaN behind
+        isw_collection['rrn'] = pd.to_numeric(isw_collection['rrn'], errors='raise').astype('int64')
         
         # ISW Bank Reconciliation
-        isw_b_recon = self.isw_recon.merge(
-            isw_collection,
-            how='inner',
-            left_on='reference_number',
-            right_on='rrn'
+        recon_ref, bank_rrn = self._factorize_keys(
+            self.isw_recon['reference_number'], isw_collection['rrn']
         )
         
-        not_isw_b_recon = self.isw_recon.merge(
-            isw_collection,
-            how='outer',
-            left_on='reference_number',
-            right_on='rrn',
-            indicator=True
-        )
+        self.results['isw_b_unsettled_claim'] = self.isw_recon[
+            ~np.isin(recon_ref, bank_rrn)
+        ][self.CLAIM_COLUMNS]
         
-        not_isw_b_recon['t_date'] = pd.to_datetime(
-            not_isw_b_recon['t_date'],
+        isw_b_charge_back = isw_collection[~np.isin(bank_rrn, recon_ref)][self.BANK_CHARGE_BACK_COLUMNS]
+        isw_b_charge_back['t_date'] = pd.to_datetime(
+            isw_b_charge_back['t_date'],
             format='%d %m %Y',
             errors='coerce'
         )
         
-        self.results['isw_b_unsettled_claim'] = not_isw_b_recon[
-            not_isw_b_recon['_merge'] == 'left_only'
-        ][['date_created', 'reference_number', 'stan', 'amount', 'merchant_id', 'terminal_id', 'pan_number']]
-        
-        isw_b_charge_back = not_isw_b_recon[not_isw_b_recon['_merge'] == 'right_only'][[
-            'Date', 'Transaction Narration', 'Reference', 'Value Date', 'Debit', 'Credit', 'Balance', 'rrn', 't_date'
-        ]]
-        
         # Filter by unique date
-        if self.unity_isw.empty or self.unity_isw['Local_Date_Time'].isna().all():
+        if not len(self.unity_isw) or self.unity_isw['Local_Date_Time'].isna().all():
             self.results['isw_b_charge_back'] = pd.DataFrame()
             self.results['nerf_nibss_b_credit'] = pd.DataFrame()
             self.results['being_nibss_summary'] = pd.DataFrame()
@@ -418,9 +533,9 @@ class ReconciliationService:
             self.results['ds'] = pd.DataFrame()
             return
 
-        unique_date = self.unity_isw['Local_Date_Time'].dt.date.iloc[0]
+        unique_date = self.unity_isw['Local_Date_Time'].iloc[0].date()
         isw_b_charge_back = isw_b_charge_back[
-            isw_b_charge_back['t_date'].dt.date == unique_date
+            self._day_mask(isw_b_charge_back['t_date'], unique_date)
         ]
         self.results['isw_b_charge_back'] = isw_b_charge_back
         
@@ -437,28 +552,27 @@ class ReconciliationService:
         narration_series = self._safe_str_series(collection_unity['Transaction Narration'])
         raw_date_series = narration_series.str.split('#').str.get(-3)
         raw_date_series = self._safe_str_series(raw_date_series)
+        # Dropping every non-digit also drops the surrounding whitespace
         collection_unity['raw_date'] = (
             raw_date_series
-            .str.strip()
-            .str.replace(r"\s+", "", regex=True)
             .str.replace(r"\D", "", regex=True)
             .str[-8:]
         )
         
-        collection_unity['new_date'] = collection_unity['raw_date'].apply(self._parse_mixed_date)
+        collection_unity['new_date'] = self._parse_mixed_date_series(collection_unity['raw_date'])
         
         # NERF NIBSS transactions
         nerf_nibss = collection_unity[
-            narration_series.str.strip().str.endswith('NEFT', na=False)
+            self._unity_masks['neft']
         ].reset_index()
         
         grouped_nerf = nerf_nibss.groupby(['new_date'])['Credit'].sum().reset_index()
-        nerf_nibss_b_credit = grouped_nerf[grouped_nerf['new_date'].dt.date == unique_date]
+        nerf_nibss_b_credit = grouped_nerf[self._day_mask(grouped_nerf['new_date'], unique_date)]
         self.results['nerf_nibss_b_credit'] = nerf_nibss_b_credit
         
         # BEING NIBSS transactions
         being_nibss = collection_unity[
-            narration_series.str.strip().str.startswith('BEING', na=False)
+            self._unity_masks['being']
         ].reset_index()
         
         being_nibss_summary = being_nibss.drop(columns=['raw_date', 'new_date'])
@@ -466,7 +580,7 @@ class ReconciliationService:
             being_nibss_summary['Value Date'], errors='coerce'
         )
         being_nibss_summary = being_nibss_summary[
-            being_nibss_summary['Value Date'].dt.date == unique_date
+            self._day_mask(being_nibss_summary['Value Date'], unique_date)
         ]
         self.results['being_nibss_summary'] = being_nibss_summary
         
@@ -476,12 +590,8 @@ class ReconciliationService:
     def _process_additional_bank_items(self, unique_date):
         """Process charge backs, terminal owner fees, and daily sweeps."""
         # Charge backs
-        narration_series = self._safe_str_series(
-            self.collection_account_unity['Transaction Narration']
-        )
-        cb = self.collection_account_unity[
-            narration_series.str.startswith('RVSL', na=False)
-        ]
+        masks = self._unity_masks
+        cb = self.collection_account_unity[masks['rvsl']]
         
         cb_narration = self._safe_str_series(cb['Transaction Narration'])
         cb['raw_date'] = (
@@ -489,88 +599,80 @@ class ReconciliationService:
             .str.split('-')
             .str[-2]
             .str[-11:]
-            .str.strip(" ")
-            .str.replace(r"\s+", "", regex=True)
             .str.replace(r"\D", "", regex=True)
         )
         
         cb['raw_date'] = cb['raw_date'].astype(str).str.zfill(8)
-        cb['new_date'] = cb['raw_date'].apply(self._parse_mixed_date)
+        cb['new_date'] = self._parse_mixed_date_series(cb['raw_date'])
         cb['Value Date'] = pd.to_datetime(cb['Value Date'], errors='coerce')
-        cb = cb[cb['Value Date'].dt.date == unique_date]
+        cb = cb[self._day_mask(cb['Value Date'], unique_date)]
         self.results['cb'] = cb
         
-        # Terminal owner fee
-        isw_collection = self.collection_account_unity[
-            narration_series.str.upper().str.startswith('2LBP')
-        ]
-        
-        being_nibss = self.collection_account_unity[
-            narration_series.str.strip().str.startswith('BEING', na=False)
-        ]
-        
-        tof_df = self.collection_account_unity[
-            narration_series.str.endswith('TRANSACTION', na=False)
-        ]
-        
-        exclude_narrations = pd.concat([
-            isw_collection['Transaction Narration'],
-            being_nibss['Transaction Narration'],
-            cb['Transaction Narration']
-        ]).drop_duplicates()
-        
-        tof_df = tof_df[~tof_df['Transaction Narration'].isin(exclude_narrations)]
+        # Terminal owner fee, excluding ISW, BEING and RVSL narrations
+        tof = masks['tof'] & ~(masks['isw'] | masks['being'] | masks['rvsl'])
+        tof_df = self.collection_account_unity[tof]
         tof_df['Value Date'] = pd.to_datetime(tof_df['Value Date'], errors='coerce')
-        tof_df = tof_df[tof_df['Value Date'].dt.date == unique_date]
+        on_date = self._day_mask(tof_df['Value Date'], unique_date).to_numpy()
+        tof_df = tof_df[on_date]
         self.results['tof_df'] = tof_df
         
         # Daily sweep
-        ds = tof_df[self._safe_str_series(tof_df['Transaction Narration']).str.startswith('DAILY', na=False)]
+        ds = tof_df[masks['daily'][tof][on_date]]
         self.results['ds'] = ds
     
-    def _parse_mixed_date(self, x):
-        """Parse date string in various formats."""
-        if pd.isna(x):
-            return pd.NaT
-        
-        x = str(x).strip()
-        
-        if len(x) != 8 or not x.isdigit():
-            return pd.NaT
-        
-        # YYYYMMDD
-        if x.startswith(("19", "20")):
-            return pd.to_datetime(x, format="%Y%m%d", errors="coerce")
-        
-        # Try DDMMYYYY
-        dt = pd.to_datetime(x, format="%d%m%Y", errors="coerce")
-        if not pd.isna(dt):
-            return dt
+    def _parse_mixed_date_series(self, series: pd.Series) -> pd.Series:
+        """
+        Parse 8-digit date strings in various formats.
         
-        # Try MMDDYYYY
-        return pd.to_datetime(x, format="%m%d%Y", errors="coerce")
+        Strings starting with 19/20 are read as YYYYMMDD; the rest are tried
+        as DDMMYYYY, then MMDDYYYY. Each format is parsed in one vectorized
+        call over its subset. Anything else becomes NaT.
+        """
+        text = self._safe_str_series(series).str.strip()
+        valid = (text.str.len() == 8) & text.str.isdigit()
+        year_first = valid & text.str[:2].isin(["19", "20"])
+        day_or_month_first = valid & ~year_first
+        
+        parsed = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+        parsed[year_first] = pd.to_datetime(
+            text[year_first], format="%Y%m%d", errors="coerce"
+        ).to_numpy()
+        
+        candidates = text[day_or_month_first]
+        day_first = pd.to_datetime(candidates, format="%d%m%Y", errors="coerce")
+        month_first = pd.to_datetime(candidates, format="%m%d%Y", errors="coerce")
+        parsed[day_or_month_first] = day_first.fillna(month_first).to_numpy()
+        
+        return parsed
 
     def get_debug_info(self) -> Dict:
         """Return debug info to validate filters and date alignment."""
-        def summarize_dates(df: pd.DataFrame, column: str) -> Dict:
+        def parsed_dates(name: str, df: pd.DataFrame, column: str) -> pd.Series:
+            # Reuse the parse from _prepare_data; parse here only if it never ran
+            dates = self._parsed_dates.get(name)
+            if dates is None:
+                dates = pd.to_datetime(df[column], errors="coerce")
+            return dates
+
+        def summarize_dates(name: str, df: pd.DataFrame, column: str) -> Dict:
             if column not in df.columns:
                 return {"column": column, "rows": len(df), "min": None, "max": None}
-            series = pd.to_datetime(df[column], errors="coerce")
-            series = series.dropna()
-            if series.empty:
+            series = parsed_dates(name, df, column).dropna()
+            if not len(series):
                 return {"column": column, "rows": len(df), "min": None, "max": None}
+            bounds = series.agg(["min", "max"])
             return {
                 "column": column,
                 "rows": len(df),
-                "min": series.min().date().isoformat(),
-                "max": series.max().date().isoformat()
+                "min": bounds["min"].date().isoformat(),
+                "max": bounds["max"].date().isoformat()
             }
 
-        def count_for_date(df: pd.DataFrame, column: str) -> int:
+        def count_for_date(name: str, df: pd.DataFrame, column: str) -> int:
             if column not in df.columns:
                 return 0
-            dates = pd.to_datetime(df[column], errors="coerce").dt.date
-            return int((dates == self.run_date).sum())
+            dates = parsed_dates(name, df, column)
+            return int(self._day_mask(dates, self.run_date).sum())
 
         def summarize_non_string(df: pd.DataFrame, column: str) -> Dict:
             if column not in df.columns:
@@ -596,16 +698,20 @@ class ReconciliationService:
                 "collection_account_parallex": len(self.raw_collection_account_parallex)
             },
             "dates": {
-                "card_df": summarize_dates(self.raw_card_df, "date_created"),
-                "nibss_unity_settlement_df": summarize_dates(self.raw_nibss_unity_settlement_df, "Local_Date_Time"),
-                "unity_settlement": summarize_dates(self.raw_unity_settlement, "Local_Date_Time"),
-                "parallex_nibss": summarize_dates(self.raw_parallex_nibss, "Local_Date_Time")
+                "card_df": summarize_dates("card_df", self.raw_card_df, "date_created"),
+                "nibss_unity_settlement_df": summarize_dates(
+                    "nibss_unity_settlement_df", self.raw_nibss_unity_settlement_df, "Local_Date_Time"
+                ),
+                "unity_settlement": summarize_dates("unity_settlement", self.raw_unity_settlement, "Local_Date_Time"),
+                "parallex_nibss": summarize_dates("parallex_nibss", self.raw_parallex_nibss, "Local_Date_Time")
             },
             "run_date_counts": {
-                "card_df": count_for_date(self.raw_card_df, "date_created"),
-                "nibss_unity_settlement_df": count_for_date(self.raw_nibss_unity_settlement_df, "Local_Date_Time"),
-                "unity_settlement": count_for_date(self.raw_unity_settlement, "Local_Date_Time"),
-                "parallex_nibss": count_for_date(self.raw_parallex_nibss, "Local_Date_Time")
+                "card_df": count_for_date("card_df", self.raw_card_df, "date_created"),
+                "nibss_unity_settlement_df": count_for_date(
+                    "nibss_unity_settlement_df", self.raw_nibss_unity_settlement_df, "Local_Date_Time"
+                ),
+                "unity_settlement": count_for_date("unity_settlement", self.raw_unity_settlement, "Local_Date_Time"),
+                "parallex_nibss": count_for_date("parallex_nibss", self.raw_parallex_nibss, "Local_Date_Time")
             },
             "card_filters": {
                 "card_df_filtered": len(self.card_df),
@@ -631,168 +737,125 @@ class ReconciliationService:
 
         return debug
     
+    def _column_sums(self, sources: list) -> np.ndarray:
+        """
+        NaN-skipping sums of several (df, column) pairs in one reduction.
+        
+        The columns are concatenated into one float64 array and summed per
+        segment with np.add.reduceat. Absent columns, as in the bare
+        DataFrame() placeholders left by the early return in
+        _process_bank_statements, and empty frames sum to 0.0.
+        """
+        arrays = [
+            df[column].to_numpy(dtype=np.float64) if column in df.columns else np.empty(0)
+            for df, column in sources
+        ]
+        lengths = np.array([len(array) for array in arrays])
+        values = np.concatenate(arrays)
+        values[np.isnan(values)] = 0.0
+        
+        # reduceat cannot express an empty segment, so only non-empty
+        # segments are reduced; each runs up to the next non-empty offset
+        sums = np.zeros(len(arrays))
+        non_empty = lengths > 0
+        if non_empty.any():
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            sums[non_empty] = np.add.reduceat(values, offsets[non_empty])
+        return sums
+    
     def _generate_metrics(self):
         """Generate comprehensive metrics."""
-        nibss_unity_df = self.results['nibss_unity_df']
-        interswitch_unity_df = self.results['interswitch_unity_df']
-        nibss_parallex_df = self.results['nibss_parallex_df']
-        nibss_unity_settlement = self.results['nibss_unity_settlement']
-        unity_isw_agg = self.results['unity_isw_agg']
-        parallex_nibss_df = self.results['parallex_nibss_df']
-        
-        charge_back = self.results['charge_back']
-        isw_charge_back = self.results['isw_charge_back']
-        parallex_charge_back = self.results['parallex_charge_back']
-        
-        unsettled_claim = self.results['unsettled_claim']
-        isw_unsettled_claim = self.results['isw_unsettled_claim']
-        parallex_unsettled_claim = self.results['parallex_unsettled_claim']
-        
-        isw_b_unsettled_claim = self.results['isw_b_unsettled_claim']
-        isw_b_charge_back = self.results['isw_b_charge_back']
-        
-        # Calculate totals
-        total_revenue = (
-            float(nibss_unity_df['Gross'].values[0])
-            + float(interswitch_unity_df['Gross'].values[0])
-            + float(nibss_parallex_df['Gross'].values[0])
-        )
-        
-        total_settlement = (
-            float(nibss_unity_settlement['Tran_Amount_Req'].values[0])
-            + float(unity_isw_agg['Tran_Amount_Req'].values[0])
-            + float(parallex_nibss_df['Tran_Amount_Req'].values[0])
-        )
-        
-        total_settlement_charge_back = (
-            (charge_back['Tran_Amount_Req'].sum() if not charge_back.empty else 0)
-            + (isw_charge_back['Tran_Amount_Req'].sum() if not isw_charge_back.empty else 0)
-            + (parallex_charge_back['Tran_Amount_Req'].sum() if not parallex_charge_back.empty else 0)
-        )
-        
-        total_settlement_unsettled_claims = (
-            (unsettled_claim['amount'].sum() if not unsettled_claim.empty else 0)
-            + (isw_unsettled_claim['amount'].sum() if not isw_unsettled_claim.empty else 0)
-            + (parallex_unsettled_claim['amount'].sum() if not parallex_unsettled_claim.empty else 0)
-        )
+        def first_value(df: pd.DataFrame, column: str) -> float:
+            return float(df[column].iat[0])
+
+        sums = self._column_sums([(self.results[key], column) for key, column in self.METRIC_SUMS])
+        channel_sums = sums[:-2].reshape(len(self.METRIC_CHANNELS), 2)
+        total_bank_isw_unsettled_claims, total_bank_isw_charge_back = sums[-2:].tolist()
+        
+        settlement_channels = {
+            name: {
+                "revenue": first_value(self.results[summary], 'Gross'),
+                "settlement": first_value(self.results[settlement], 'Tran_Amount_Req'),
+                "charge_back": charge_back_sum,
+                "unsettled_claim": unsettled_claim_sum
+            }
+            for (name, (summary, settlement, _, _)), (charge_back_sum, unsettled_claim_sum)
+            in zip(self.METRIC_CHANNELS.items(), channel_sums.tolist())
+        }
         
-        total_bank_isw_unsettled_claims = (
-            isw_b_unsettled_claim['amount'].sum() if not isw_b_unsettled_claim.empty else 0
+        # One row per channel, columns in the order of the channel dicts
+        channel_values = np.array(
+            [list(channel.values()) for channel in settlement_channels.values()],
+            dtype=np.float64
         )
-        
-        total_bank_isw_charge_back = (
-            isw_b_charge_back['Credit'].sum() if not isw_b_charge_back.empty else 0
+        total_revenue, total_settlement, total_settlement_charge_back, total_settlement_unsettled_claims = (
+            channel_values.sum(axis=0).tolist()
         )
         
         self.metrics = {
             "run_date": str(self.run_date),
-            "total_revenue": float(total_revenue),
-            "total_settlement": float(total_settlement),
-            "total_settlement_charge_back": float(total_settlement_charge_back),
-            "total_settlement_unsettled_claims": float(total_settlement_unsettled_claims),
-            "total_bank_isw_unsettled_claims": float(total_bank_isw_unsettled_claims),
-            "total_bank_isw_charge_back": float(total_bank_isw_charge_back),
+            "total_revenue": total_revenue,
+            "total_settlement": total_settlement,
+            "total_settlement_charge_back": total_settlement_charge_back,
+            "total_settlement_unsettled_claims": total_settlement_unsettled_claims,
+            "total_bank_isw_unsettled_claims": total_bank_isw_unsettled_claims,
+            "total_bank_isw_charge_back": total_bank_isw_charge_back,
             "channels": {
-                "NIBSS": {
-                    "revenue": float(nibss_unity_df['Gross'].values[0]),
-                    "settlement": float(nibss_unity_settlement['Tran_Amount_Req'].values[0]),
-                    "charge_back": float(charge_back['Tran_Amount_Req'].sum() if not charge_back.empty else 0),
-                    "unsettled_claim": float(unsettled_claim['amount'].sum() if not unsettled_claim.empty else 0)
-                },
-                "INTERSWITCH": {
-                    "revenue": float(interswitch_unity_df['Gross'].values[0]),
-                    "settlement": float(unity_isw_agg['Tran_Amount_Req'].values[0]),
-                    "charge_back": float(isw_charge_back['Tran_Amount_Req'].sum() if not isw_charge_back.empty else 0),
-                    "unsettled_claim": float(isw_unsettled_claim['amount'].sum() if not isw_unsettled_claim.empty else 0)
-                },
-                "PARALLEX": {
-                    "revenue": float(nibss_parallex_df['Gross'].values[0]),
-                    "settlement": float(parallex_nibss_df['Tran_Amount_Req'].values[0]),
-                    "charge_back": float(parallex_charge_back['Tran_Amount_Req'].sum() if not parallex_charge_back.empty else 0),
-                    "unsettled_claim": float(parallex_unsettled_claim['amount'].sum() if not parallex_unsettled_claim.empty else 0)
-                },
+                **settlement_channels,
                 "ISW Bank": {
-                    "charge_back": float(isw_b_unsettled_claim['amount'].sum() if not isw_b_unsettled_claim.empty else 0),
-                    "unsettled_claim": float(isw_b_charge_back['Credit'].sum() if not isw_b_charge_back.empty else 0)
+                    "charge_back": total_bank_isw_unsettled_claims,
+                    "unsettled_claim": total_bank_isw_charge_back
                 }
             }
         }
     
+    def _output_frame(self, *frames: pd.DataFrame) -> pd.DataFrame:
+        """
+        Build one output frame led by a run_date column.
+        
+        Several frames are placed side by side (they share an index and have
+        distinct columns); the result is constructed once from a dict of
+        columns, with no intermediate concat and no insert afterwards. run_date
+        is categorical; the Sheets normalizer turns it back into plain dates. A
+        single frame that is empty or already has run_date is returned as is.
+        """
+        if len(frames) == 1 and (not len(frames[0]) or "run_date" in frames[0].columns):
+            return frames[0]
+        index = frames[0].index
+        # One int8 code per row over a single category, not a pointer per row
+        run_date = pd.Categorical.from_codes(np.zeros(len(index), dtype=np.int8), categories=[self.run_date])
+        columns = {"run_date": run_date}
+        for frame in frames:
+            columns.update(frame.items())
+        return pd.DataFrame(columns, index=index)
+    
     def _prepare_output_datasets(self):
         """Prepare datasets for output with run_date column."""
-        # Join tables for output
-        nibss_parallex = pd.concat([
-            self.results['nibss_parallex_df'],
-            self.results['parallex_nibss_df']
-        ], axis=1)
-        
-        nibss_unity = pd.concat([
-            self.results['nibss_unity_df'],
-            self.results['nibss_unity_settlement']
-        ], axis=1)
-        
-        isw_unity = pd.concat([
-            self.results['interswitch_unity_df'],
-            self.results['unity_isw_agg']
-        ], axis=1)
-        
-        nibss_reconciliation = pd.concat([
-            self.results['unsettled_claim'],
-            self.results['charge_back']
-        ], axis=1)
-        
-        isw_reconciliation = pd.concat([
-            self.results['isw_unsettled_claim'],
-            self.results['isw_charge_back']
-        ], axis=1)
-        
-        parallex_reconciliation = pd.concat([
-            self.results['parallex_unsettled_claim'],
-            self.results['parallex_charge_back']
-        ], axis=1)
-        
-        isw_bank_reconciliation = pd.concat([
-            self.results['isw_b_unsettled_claim'],
-            self.results['isw_b_charge_back']
-        ], axis=1)
-        
-        # Store final datasets
-        self.output_datasets = {
-            "paybox_trans_df": self.results['paybox_trans_df'],
-            "nibss_parallex": nibss_parallex,
-            "nibss_unity": nibss_unity,
-            "nibss_reconciliation": nibss_reconciliation,
-            "isw_reconciliation": isw_reconciliation,
-            "parallex_reconciliation": parallex_reconciliation,
-            "isw_bank_reconciliation": isw_bank_reconciliation,
-            "nerf_nibss_b_credit": self.results['nerf_nibss_b_credit'],
-            "being_nibss_summary": self.results['being_nibss_summary'],
-            "cb": self.results['cb'],
-            "tof_df": self.results['tof_df'],
-            "ds": self.results['ds']
-        }
-        
-        # Add run_date to all datasets
-        for df in self.output_datasets.values():
-            if not df.empty and "run_date" not in df.columns:
-                df.insert(0, "run_date", self.run_date)
+        self.output_datasets = {}
+        for name, (layout, keys) in self.OUTPUT_DATASETS.items():
+            frames = [self.results[key] for key in keys]
+            if layout == "stacked":
+                frames = [pd.concat(frames, ignore_index=True)]
+            self.output_datasets[name] = self._output_frame(*frames)
     
     def save_metrics_to_file(self) -> str:
         """Save metrics to JSON file."""
-        os.makedirs(settings.output_dir, exist_ok=True)
-        
         run_date_str = self.run_date.isoformat()
-        metrics_path = os.path.join(settings.output_dir, f"metrics_{run_date_str}.json")
+        metrics_path = _output_dir(settings.output_dir) / f"metrics_{run_date_str}.json"
         
-        def default_serializer(obj):
-            if isinstance(obj, (date, datetime)):
-                return obj.isoformat()
-            raise TypeError(f"Type {type(obj)} not serializable")
-        
-        with open(metrics_path, "w") as f:
-            json.dump(self.metrics, f, indent=2, default=default_serializer)
-        
-        return metrics_path
+        # orjson writes dates as ISO strings and numpy scalars natively
+        payload = orjson.dumps(
+            self.metrics,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+        )
+        try:
+            metrics_path.write_bytes(payload)
+        except FileNotFoundError:
+            # Directory removed since it was first created
+            metrics_path.parent.mkdir(parents=True, exist_ok=True)
+            metrics_path.write_bytes(payload)
+        
+        return str(metrics_path)
     
     def get_output_datasets(self) -> Dict[str, pd.DataFrame]:
         """Get all output datasets."""
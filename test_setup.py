@@ -7,7 +7,9 @@ Run this before deploying to verify everything is set up correctly.
 import os
 import json
 import base64
+import importlib.util
 import sys
+from functools import lru_cache
 from pathlib import Path
 
 # Add project root to path
@@ -41,6 +43,18 @@ def print_error(text):
     print(f"❌ {text}")
 
 
+@lru_cache(maxsize=1)
+def _decode_base64_credentials(value):
+    """Decode a base64 service account JSON string (memoized per value)."""
+    return json.loads(base64.b64decode(value).decode('utf-8'))
+
+
+@lru_cache(maxsize=1)
+def _parse_json_credentials(value):
+    """Parse a service account JSON string (memoized per value)."""
+    return json.loads(value)
+
+
 def test_openai():
     """Test OpenAI configuration."""
     print_header("Testing OpenAI Configuration")
@@ -93,8 +107,7 @@ def test_google_credentials():
     if base64_creds:
         print("Found GOOGLE_CREDENTIALS_BASE64 (Method 1)...")
         try:
-            decoded = base64.b64decode(base64_creds).decode('utf-8')
-            creds_dict = json.loads(decoded)
+            creds_dict = _decode_base64_credentials(base64_creds)
             
             if "type" in creds_dict and creds_dict["type"] == "service_account":
                 project_id = creds_dict.get("project_id", "unknown")
@@ -118,7 +131,7 @@ def test_google_credentials():
     if json_creds:
         print("Found GOOGLE_CREDENTIALS_JSON (Method 2)...")
         try:
-            creds_dict = json.loads(json_creds)
+            creds_dict = _parse_json_credentials(json_creds)
             if "type" in creds_dict and creds_dict["type"] == "service_account":
                 project_id = creds_dict.get("project_id", "unknown")
                 print_success(f"✓ Valid JSON service account (Project: {project_id})")
@@ -196,12 +209,17 @@ def test_imports():
         ("pydantic", "Pydantic"),
     ]
     
+    # Locate each module without executing it; importing pandas and the
+    # Google/OpenAI clients just to check they are installed is slow
     all_ok = True
     for module_name, display_name in imports:
         try:
-            __import__(module_name)
-            print_success(f"{display_name} ({module_name})")
+            found = importlib.util.find_spec(module_name) is not None
         except ImportError:
+            found = False
+        if found:
+            print_success(f"{display_name} ({module_name})")
+        else:
             print_error(f"{display_name} ({module_name}) - NOT INSTALLED")
             all_ok = False
     
@@ -2,6 +2,7 @@
 Utility functions for the application.
 """
 from datetime import datetime, date
+from functools import lru_cache
 from typing import Any
 
 
@@ -23,10 +24,14 @@ def serialize_date(obj: Any) -> str:
     raise TypeError(f"Type {type(obj)} not serializable")
 
 
+@lru_cache(maxsize=1024)
 def parse_date_string(date_str: str) -> date:
     """
     Parse a date string in YYYY-MM-DD format.
     
+    Results are memoized; date objects are immutable, so sharing them
+    between callers is safe.
+    
     Args:
         date_str: Date string to parse
         